@@ -175,8 +175,7 @@ class Settings:
         write_settings(self._settings)
 
     def reset(self, force_write=False):
-        for k, v in self.setting_type.get_default_settings().items():
-            self._cp_settings[k] = v
+        self._cp_settings.update(self.setting_type.get_default_settings())
 
         def_path = self.default_data_path
         def_path += "enigma2/" if self.setting_type is SettingsType.ENIGMA_2 else "neutrino/"
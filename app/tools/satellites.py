@@ -1,15 +1,44 @@
 """ Module for download satellites from internet ("flysat.com")
     for  replace or update current satellites.xml file.
 """
+import json
+import os
 import re
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from hashlib import md5
 
 import requests
+import requests.adapters
 from enum import Enum
 from html.parser import HTMLParser
 
 from app.commons import log
 from app.eparser import Satellite, Transponder, is_transponder_valid
 from app.eparser.ecommons import PLS_MODE
+from app.settings import HOME_PATH
+
+# Satellite entry of the list received from the source.
+SatelliteData = namedtuple("SatelliteData", ["name", "position", "type", "url", "selected"])
+
+_CACHE_PATH = HOME_PATH + "/.cache/demon-editor/satellites/"
+_CACHE_MAX_AGE = 30 * 24 * 60 * 60  # 30 days
+
+_PLS_MODES = {v: k for k, v in PLS_MODE.items()}
+# The frequency and symbol rate on the pages are in MHz and MSym/s.
+_FREQ_ZEROS = "000"
+# FlySat
+_PLS_RE = re.compile("(PLS:)+ (Root|Gold|Combo)+ (\\d+)?")
+_IS_ID_RE = re.compile("(Stream) (\\d+)")
+# LyngSat
+_FRQ_POL_RE = re.compile("(\\d{4,5})\\s+([RLHV]).*")
+_SR_FEC_RE = re.compile("^(\\d{4,5})-(\\d/\\d)(.+PSK)?(.*)?$")
+_SYS_RE = re.compile("(DVB-S[2]?) ?(PLS+ (Root|Gold|Combo)+ (\\d+))* ?(multistream stream (\\d+))?", re.IGNORECASE)
+_EXTRA_RE = re.compile(r"^https://www\.lyngsat\.com/[\w-]+\.html")
+# Position
+_POS_STRIP_RE = re.compile("[^0-9A-Za-z.]")
 
 
 class SatelliteSource(Enum):
@@ -26,6 +55,9 @@ class SatellitesParser(HTMLParser):
     """ Parser for satellite html page. """
 
     _HEADERS = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.9; rv:45.0) Gecko/20100101 Firefox/59.02"}
+    # Should not exceed the pool size of the session adapter.
+    _MAX_WORKERS = 16
+    _CHUNK_SIZE = 65536
 
     def __init__(self, source=SatelliteSource.FLYSAT, entities=False, separator=' '):
 
@@ -40,65 +72,75 @@ class SatellitesParser(HTMLParser):
         self._current_cell = []
         self._rows = []
         self._source = source
+        # One session for all requests to reuse pooled (keep-alive) connections.
+        self._session = requests.Session()
+        self._session.headers.update(self._HEADERS)
+        self._session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=20))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close_session()
+
+    def close_session(self):
+        """ Closes the session and releases pooled connections. """
+        self._session.close()
 
     def handle_starttag(self, tag, attrs):
-        if tag == 'td':
+        if tag == "td":
             self._is_td = True
-        if tag == 'tr':
+        elif tag == "tr":
             self._is_th = True
-        if tag == "a":
+        elif tag == "a":
             self._current_row.append(attrs[0][1])
 
     def handle_data(self, data):
         """ Save content to a cell """
         if self._is_td or self._is_th:
-            self._current_cell.append(data.strip())
+            data = data.strip()
+            if data:
+                self._current_cell.append(data)
 
     def handle_endtag(self, tag):
-        if tag == 'td':
+        if tag == "td":
             self._is_td = False
-        elif tag == 'tr':
+            self.append_cell()
+        elif tag == "th":
+            self.append_cell()
+        elif tag == "tr":
             self._is_th = False
-
-        if tag in ('td', 'th'):
-            final_cell = self._separator.join(self._current_cell).strip()
-            self._current_row.append(final_cell)
-            self._current_cell = []
-        elif tag == 'tr':
-            row = self._current_row
-            self._rows.append(row)
+            self._rows.append(self._current_row)
             self._current_row = []
 
+    def append_cell(self):
+        cell = self._current_cell
+        # Cell parts are already stripped and not empty.
+        self._current_row.append(cell[0] if len(cell) == 1 else self._separator.join(cell))
+        self._current_cell.clear()
+
     def error(self, message):
         pass
 
     def get_satellites_list(self, source):
         """ Getting complete list of satellites. """
+        clean_cache()
         self.reset()
         self._rows.clear()
         self._source = source
 
         for src in SatelliteSource.get_sources(self._source):
             try:
-                request = requests.get(url=src, headers=self._HEADERS)
+                self.feed_page(src)
             except requests.exceptions.ConnectionError as e:
                 log(repr(e))
                 return []
-            else:
-                reason = request.reason
-                if reason == "OK":
-                    self.feed(request.text)
-                else:
-                    log(reason)
 
         if self._rows:
             if self._source is SatelliteSource.FLYSAT:
-                def get_sat(r):
-                    return r[1], self.parse_position(r[2]), r[3], r[0], False
-
-                return list(map(get_sat, filter(lambda x: all(x) and len(x) == 5, self._rows)))
+                return [SatelliteData(r[1], self.parse_position(r[2]), r[3], r[0], False)
+                        for r in self._rows if len(r) == 5 and all(r)]
             elif self._source is SatelliteSource.LYNGSAT:
-                extra_pattern = re.compile("^https://www\.lyngsat\.com/[\w-]+\.html")
                 base_url = "https://www.lyngsat.com/"
                 sats = []
                 current_pos = "0"
@@ -106,37 +148,44 @@ class SatellitesParser(HTMLParser):
                     r_len = len(row)
                     if r_len == 7:
                         current_pos = self.parse_position(row[2])
-                        name = row[1].rsplit("/")[-1].rstrip(".html").replace("-", " ")
-                        sats.append((name, current_pos, row[5], base_url + row[1], False))  # [all in one] satellites
-                        sats.append((row[4], current_pos, row[5], base_url + row[3], False))
+                        name = self.get_name_from_url(row[1])
+                        # [all in one] satellites
+                        sats.append(SatelliteData(name, current_pos, row[5], base_url + row[1], False))
+                        sats.append(SatelliteData(row[4], current_pos, row[5], base_url + row[3], False))
                     if r_len == 8:  # for a very limited number of satellites
                         data = list(filter(None, row))
                         urls = set()
                         sat_type = ""
                         for d in data:
-                            url = re.match(extra_pattern, d)
+                            url = _EXTRA_RE.match(d)
                             if url:
                                 urls.add(url.group(0))
                             if d in ("C", "Ku", "CKu"):
                                 sat_type = d
                         current_pos = self.parse_position(data[1])
                         for url in urls:
-                            name = url.rsplit("/")[-1].rstrip(".html").replace("-", " ")
-                            sats.append((name, current_pos, sat_type, base_url + url, False))
+                            name = self.get_name_from_url(url)
+                            sats.append(SatelliteData(name, current_pos, sat_type, base_url + url, False))
                     elif r_len == 5:
-                        sats.append((row[2], current_pos, row[3], base_url + row[1], False))
+                        sats.append(SatelliteData(row[2], current_pos, row[3], base_url + row[1], False))
                 return sats
 
-    def get_satellite(self, sat):
+    def get_satellite(self, sat, transponders=None):
+        """ Returns satellite. If transponders are not given, they will be received. """
         pos = sat[1]
         return Satellite(name="{} {}".format(pos, sat[0]),
                          flags="0",
                          position=self.get_position(pos.replace(".", "")),
-                         transponders=self.get_transponders(sat[3]))
+                         transponders=self.get_transponders(sat[3]) if transponders is None else transponders)
 
     @staticmethod
     def parse_position(pos_str):
-        return "".join(c for c in pos_str if c.isdigit() or c.isalpha() or c == ".")
+        return _POS_STRIP_RE.sub("", pos_str)
+
+    @staticmethod
+    def get_name_from_url(url):
+        """ Returns satellite name from the page url [...ends with "/Sat-Name.html"]. """
+        return url[url.rfind("/") + 1:-5].replace("-", " ")
 
     @staticmethod
     def get_position(pos):
@@ -144,35 +193,125 @@ class SatellitesParser(HTMLParser):
 
     def get_transponders(self, sat_url):
         """ Getting transponders(sorted by frequency). """
+        self.init_transponders_page()
+        try:
+            self.feed_page(self.get_transponders_url(sat_url))
+        except requests.exceptions.ConnectionError as e:
+            log(repr(e))
+            self._rows.clear()
+
+        return self.get_transponders_from_rows()
+
+    def get_all_transponders(self, sat_urls):
+        """ Getting transponders for several satellites at once.
+
+            Pages are downloaded concurrently via the common session and parsed one by one
+            as they are received. Yields pairs: satellite url, transponders(sorted by frequency).
+        """
+        with ThreadPoolExecutor(max_workers=self._MAX_WORKERS) as executor:
+            futures = {executor.submit(self.get_page, url): url for url in sat_urls}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], self.parse_transponders(future.result())
+            finally:
+                # Not started downloads are canceled if the iteration is interrupted.
+                for future in futures:
+                    future.cancel()
+
+    def get_transponders_url(self, sat_url):
+        return "https://www.flysat.com/" + sat_url if self._source is SatelliteSource.FLYSAT else sat_url
+
+    def iter_page(self, url):
+        """ Yields the page text in chunks as they are received.
+
+            A conditional request is used: if the page has not been modified since the last download,
+            the cached copy is yielded. A received page is cached if the server has provided validators for it.
+            Connection errors are not handled here.
+        """
+        cached = get_cached_page(url)
+        with self._session.get(url, headers=get_validation_headers(cached), stream=True) as request:
+            if request.status_code == 304 and cached:
+                touch_cached_page(url)
+                yield cached["text"]
+                return
+
+            reason = request.reason
+            if reason != "OK":
+                log(reason)
+                return
+
+            if request.encoding is None:
+                request.encoding = "utf-8"
+            # The page text is kept only if it can be cached.
+            chunks = [] if has_validators(request.headers) else None
+            for chunk in request.iter_content(chunk_size=self._CHUNK_SIZE, decode_unicode=True):
+                if chunks is not None:
+                    chunks.append(chunk)
+                yield chunk
+
+            if chunks is not None:
+                cache_page(url, request.headers, "".join(chunks))
+
+    def feed_page(self, url):
+        """ Feeds the page to the parser in chunks as they are received. """
+        self.feed_chunks(self.iter_page(url))
+
+    def feed_chunks(self, chunks):
+        """ Feeds the page text chunks to the parser. """
+        # Each chunk is fed up to the last closed tag to not split
+        # the text data of the cells between several handle_data calls.
+        tail = ""
+        for chunk in chunks:
+            data = tail + chunk
+            pos = data.rfind(">") + 1
+            self.feed(data[:pos])
+            tail = data[pos:]
+        self.feed(tail)
+
+    def get_page(self, sat_url):
+        """ Returns text chunks of the satellite page or None if the page is not received.
+
+            Used by the download workers. The chunks are fed to the parser later by parse_transponders.
+        """
+        try:
+            return list(self.iter_page(self.get_transponders_url(sat_url))) or None
+        except requests.exceptions.ConnectionError as e:
+            log(repr(e))
+
+    def parse_transponders(self, page):
+        """ Parsing transponders from the satellite page text chunks. """
+        self.init_transponders_page()
+        if page:
+            self.feed_chunks(page)
+
+        return self.get_transponders_from_rows()
+
+    def init_transponders_page(self):
+        self.reset()
         self._rows.clear()
-        url = "https://www.flysat.com/" + sat_url if self._source is SatelliteSource.FLYSAT else sat_url
-        request = requests.get(url=url, headers=self._HEADERS)
-        reason = request.reason
+
+    def get_transponders_from_rows(self):
         trs = []
-        if reason == "OK":
-            self.feed(request.text)
-            if self._source is SatelliteSource.FLYSAT:
-                self.get_transponders_for_fly_sat(trs)
-            elif self._source is SatelliteSource.LYNGSAT:
-                self.get_transponders_for_lyng_sat(trs)
+        if self._source is SatelliteSource.FLYSAT:
+            self.get_transponders_for_fly_sat(trs)
+        elif self._source is SatelliteSource.LYNGSAT:
+            self.get_transponders_for_lyng_sat(trs)
 
-        return sorted(trs, key=lambda x: int(x.frequency))
+        trs.sort(key=lambda x: int(x.frequency))
+        return trs
 
     def get_transponders_for_fly_sat(self, trs):
         """ Parsing transponders for FlySat """
-        pls_pattern = re.compile("(PLS:)+ (Root|Gold|Combo)+ (\\d+)?")
-        is_id_pattern = re.compile("(Stream) (\\d+)")
-        pls_modes = {v: k for k, v in PLS_MODE.items()}
         n_trs = []
 
         if self._rows:
-            zeros = "000"
             is_ids = []
             for r in self._rows:
-                if len(r) == 1:
-                    is_ids.extend(re.findall(is_id_pattern, r[0]))
+                r_len = len(r)
+                if r_len == 1:
+                    is_ids.extend(_IS_ID_RE.findall(r[0]))
                     continue
-                if len(r) < 3:
+                if r_len < 3:
                     continue
                 data = r[2].split(" ")
                 if len(data) != 2:
@@ -188,13 +327,13 @@ class SatellitesParser(HTMLParser):
                 sys, mod = sys
                 mod = "QPSK" if sys == "DVB-S" else mod
 
-                pls = re.findall(pls_pattern, r[1])
+                pls = _PLS_RE.search(r[1])
                 pls_code = None
                 pls_mode = None
 
                 if pls:
-                    pls_code = pls[0][2]
-                    pls_mode = pls_modes.get(pls[0][1], None)
+                    pls_code = pls.group(3)
+                    pls_mode = _PLS_MODES.get(pls.group(2), None)
 
                 if is_ids:
                     tr = trs.pop()
@@ -203,7 +342,7 @@ class SatellitesParser(HTMLParser):
                         if is_transponder_valid(tr):
                             n_trs.append(tr)
                 else:
-                    tr = Transponder(freq + zeros, sr + zeros, pol, fec, sys, mod, pls_mode, pls_code, None)
+                    tr = Transponder(freq + _FREQ_ZEROS, sr + _FREQ_ZEROS, pol, fec, sys, mod, pls_mode, pls_code, None)
                     if is_transponder_valid(tr):
                         trs.append(tr)
                 is_ids.clear()
@@ -211,41 +350,111 @@ class SatellitesParser(HTMLParser):
 
     def get_transponders_for_lyng_sat(self, trs):
         """ Parsing transponders for LyngSat """
-        frq_pol_pattern = re.compile("(\\d{4,5})\\s+([RLHV]).*")
-        sr_fec_pattern = re.compile("^(\\d{4,5})-(\\d/\\d)(.+PSK)?(.*)?$")
-        sys_pattern = re.compile("(DVB-S[2]?) ?(PLS+ (Root|Gold|Combo)+ (\\d+))* ?(multistream stream (\\d+))?",
-                                 re.IGNORECASE)
-        zeros = "000"
-        pls_modes = {v: k for k, v in PLS_MODE.items()}
-
         for r in filter(lambda x: len(x) > 8, self._rows):
             for frq in r[1], r[2], r[3]:
-                freq = re.match(frq_pol_pattern, frq)
+                freq = _FRQ_POL_RE.match(frq)
                 if freq:
                     break
             if not freq:
                 continue
             frq, pol = freq.group(1), freq.group(2)
-            sr_fec = re.match(sr_fec_pattern, r[-3])
+            sr_fec = _SR_FEC_RE.match(r[-3])
             if not sr_fec:
                 continue
             sr, fec, mod = sr_fec.group(1), sr_fec.group(2), sr_fec.group(3)
             mod = mod.strip() if mod else "Auto"
 
-            res = re.match(sys_pattern, r[-4])
+            res = _SYS_RE.match(r[-4])
             if not res:
                 continue
 
             sys = res.group(1)
             pls_mode = res.group(3)
-            pls_mode = pls_modes.get(pls_mode.capitalize(), None) if pls_mode else pls_mode
+            pls_mode = _PLS_MODES.get(pls_mode.capitalize(), None) if pls_mode else pls_mode
             pls_code = res.group(4)
             pls_id = res.group(6)
 
-            tr = Transponder(frq + zeros, sr + zeros, pol, fec, sys, mod, pls_mode, pls_code, pls_id)
+            tr = Transponder(frq + _FREQ_ZEROS, sr + _FREQ_ZEROS, pol, fec, sys, mod, pls_mode, pls_code, pls_id)
             if is_transponder_valid(tr):
                 trs.append(tr)
 
 
+# ******************** Pages cache ******************** #
+
+def get_cache_file(url):
+    return _CACHE_PATH + md5(url.encode("utf-8")).hexdigest() + ".json"
+
+
+def get_cached_page(url):
+    """ Returns the cached page as dict [etag, last_modified, text] or None. """
+    try:
+        with open(get_cache_file(url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_validation_headers(page):
+    """ Returns headers for the conditional request of the cached page. """
+    headers = {}
+    if page:
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+    return headers
+
+
+def has_validators(headers):
+    return bool(headers.get("ETag") or headers.get("Last-Modified"))
+
+
+def cache_page(url, headers, text):
+    """ Saves the page if the server has provided validators for it.
+
+        The page is written to a temporary file first to not be read half-written by other workers.
+    """
+    if not has_validators(headers):
+        return
+
+    data = {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"), "text": text}
+    try:
+        os.makedirs(_CACHE_PATH, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=_CACHE_PATH)
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, get_cache_file(url))
+        except OSError:
+            os.remove(tmp_path)
+            raise
+    except OSError as e:
+        log("Saving the page to the cache error: {}".format(e))
+
+
+def touch_cached_page(url):
+    """ Updates modification time of the cached page to keep it from cleaning. """
+    try:
+        os.utime(get_cache_file(url))
+    except OSError:
+        pass
+
+
+def clean_cache():
+    """ Removes cached pages [and temporary files] not used for more than _CACHE_MAX_AGE. """
+    try:
+        entries = list(os.scandir(_CACHE_PATH))
+    except OSError:
+        return
+
+    expired = time.time() - _CACHE_MAX_AGE
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        except OSError as e:
+            log("Cleaning the pages cache error: {}".format(e))
+
+
 if __name__ == "__main__":
     pass
@@ -468,7 +468,8 @@ class PiconsDialog:
 
     @run_task
     def get_satellites(self, view):
-        sats = SatellitesParser().get_satellites_list(SatelliteSource.LYNGSAT)
+        with SatellitesParser() as parser:
+            sats = parser.get_satellites_list(SatelliteSource.LYNGSAT)
         if not sats:
             self.show_info_message("Getting satellites list error!", Gtk.MessageType.ERROR)
         gen = self.append_satellites(view.get_model(), sats)
@@ -477,12 +478,12 @@ class PiconsDialog:
     def append_satellites(self, model, sats):
         try:
             for sat in sats:
-                pos = sat[1]
-                name, pos = "{} ({})".format(sat[0], pos), "{}{}".format("-" if pos[-1] == "W" else "", pos[:-1])
+                pos = sat.position
+                name, pos = "{} ({})".format(sat.name, pos), "{}{}".format("-" if pos[-1] == "W" else "", pos[:-1])
 
                 if not self._terminate and model:
                     if pos in self._sat_positions:
-                        yield model.append((name, sat[3], pos))
+                        yield model.append((name, sat.url, pos))
         finally:
             self._satellite_label.show()
 
@@ -1,6 +1,5 @@
 import re
 import time
-import concurrent.futures
 from math import fabs
 
 from gi.repository import GLib
@@ -533,41 +532,39 @@ class SatellitesUpdateDialog:
         model = self._sat_view.get_model()
         start = time.time()
 
-        with concurrent.futures.ProcessPoolExecutor(max_workers=4) as executor:
-            text = "Processing: {}\n"
-            sats = []
-            appender = self.append_output()
-            next(appender)
-            futures = {executor.submit(self._parser.get_satellite, sat[:-1]): sat for sat in [r for r in model if r[4]]}
-            for future in concurrent.futures.as_completed(futures):
-                if not self._download_task:
-                    self._download_task = True
-                    executor.shutdown()
-                    appender.send("\nCanceled\n")
-                    appender.close()
-                    self._download_task = False
-                    return
-                data = future.result()
-                appender.send(text.format(data[0]))
-                sats.append(data)
-
-            appender.send("-" * 75 + "\n")
-            appender.send("Consumed : {:0.0f}s, {} satellites received.".format(start - time.time(), len(sats)))
-            appender.close()
-
-            sats = {s[2]: s for s in sats}  # key = position, v = satellite
-
-            for row in self._main_model:
-                pos = row[-1]
-                if pos in sats:
-                    sat = sats.pop(pos)
-                    itr = row.iter
-                    self.update_satellite(itr, row, sat)
-
-            for sat in sats.values():
-                append_satellite(self._main_model, sat)
-
-            self._download_task = False
+        text = "Processing: {}\n"
+        sats = []
+        appender = self.append_output()
+        next(appender)
+        selected = {r[3]: r[:-1] for r in model if r[4]}  # key = url, v = satellite row
+        transponders = self._parser.get_all_transponders(selected)
+        for url, trs in transponders:
+            if not self._download_task:
+                transponders.close()
+                appender.send("\nCanceled\n")
+                appender.close()
+                return
+            data = self._parser.get_satellite(selected[url], trs)
+            appender.send(text.format(data[0]))
+            sats.append(data)
+
+        appender.send("-" * 75 + "\n")
+        appender.send("Consumed : {:0.0f}s, {} satellites received.".format(time.time() - start, len(sats)))
+        appender.close()
+
+        sats = {s[2]: s for s in sats}  # key = position, v = satellite
+
+        for row in self._main_model:
+            pos = row[-1]
+            if pos in sats:
+                sat = sats.pop(pos)
+                itr = row.iter
+                self.update_satellite(itr, row, sat)
+
+        for sat in sats.values():
+            append_satellite(self._main_model, sat)
+
+        self._download_task = False
 
     @run_idle
     def update_expander(self):
@@ -670,6 +667,8 @@ class SatellitesUpdateDialog:
 
     def on_quit(self, window, event):
         self._download_task = False
+        if self._parser:
+            self._parser.close_session()
 
 
 # ***************** Commons *******************#
@@ -5,10 +5,12 @@ from enum import Enum
 from app.commons import run_task, run_idle, log
 from app.connections import test_telnet, test_ftp, TestException, test_http, HttpApiException
 from app.settings import SettingsType, Settings, PlayStreamsMode
-from app.ui.dialogs import show_dialog, DialogType, get_message, get_chooser_dialog
+from app.ui.dialogs import show_dialog, DialogType, get_message, get_chooser_dialog, get_dialogs_string
 from .main_helper import update_entry_data, scroll_to, get_picon_pixbuf
 from .uicommons import Gtk, Gdk, UI_RESOURCES_PATH, FavClickMode, DEFAULT_ICON
 
+_UI_PATH = UI_RESOURCES_PATH + "settings_dialog.glade"
+
 
 def show_settings_dialog(transient, options):
     return SettingsDialog(transient, options).show()
@@ -25,6 +27,16 @@ class SettingsDialog:
     _DIGIT_PATTERN = re.compile("(?:^[\\s]*$|\\D)")
 
     def __init__(self, transient, settings: Settings):
+        self._transient = transient
+        self._dialog = None
+        # Settings
+        self._ext_settings = settings
+        self._settings = Settings(settings.settings)
+        self._profiles = self._settings.profiles
+        self._s_type = self._settings.setting_type
+
+    def init_dialog(self):
+        """ Builds the dialog UI. Called on the first show. """
         handlers = {"on_field_icon_press": self.on_field_icon_press,
                     "on_settings_type_changed": self.on_settings_type_changed,
                     "on_reset": self.on_reset,
@@ -65,18 +77,12 @@ class SettingsDialog:
                     "on_icon_theme_add": self.on_icon_theme_add,
                     "on_icon_theme_remove": self.on_icon_theme_remove}
 
-        # Settings
-        self._ext_settings = settings
-        self._settings = Settings(settings.settings)
-        self._profiles = self._settings.profiles
-        self._s_type = self._settings.setting_type
-
         builder = Gtk.Builder()
-        builder.add_from_file(UI_RESOURCES_PATH + "settings_dialog.glade")
+        builder.add_from_string(get_dialogs_string(_UI_PATH))
         builder.connect_signals(handlers)
 
         self._dialog = builder.get_object("settings_dialog")
-        self._dialog.set_transient_for(transient)
+        self._dialog.set_transient_for(self._transient)
         self._header_bar = builder.get_object("header_bar")
         self._main_stack = builder.get_object("main_stack")
         # Network
@@ -104,6 +110,24 @@ class SettingsDialog:
         self._default_data_dir_field = builder.get_object("default_data_dir_field")
         self._record_data_dir_field = builder.get_object("record_data_dir_field")
         self._default_data_paths_switch = builder.get_object("default_data_paths_switch")
+        # Profile text fields -> settings properties.
+        self._profile_fields = ((self._host_field, "host"),
+                                (self._port_field, "port"),
+                                (self._login_field, "user"),
+                                (self._password_field, "password"),
+                                (self._http_login_field, "http_user"),
+                                (self._http_password_field, "http_password"),
+                                (self._http_port_field, "http_port"),
+                                (self._telnet_login_field, "telnet_user"),
+                                (self._telnet_password_field, "telnet_password"),
+                                (self._telnet_port_field, "telnet_port"),
+                                (self._services_field, "services_path"),
+                                (self._user_bouquet_field, "user_bouquet_path"),
+                                (self._satellites_xml_field, "satellites_xml_path"),
+                                (self._picons_field, "picons_path"),
+                                (self._data_dir_field, "data_local_path"),
+                                (self._picons_dir_field, "picons_local_path"),
+                                (self._backup_dir_field, "backup_local_path"))
         # Info bar
         self._info_bar = builder.get_object("info_bar")
         self._message_label = builder.get_object("info_bar_message_label")
@@ -232,6 +256,8 @@ class SettingsDialog:
             self._header_bar.set_subtitle("{}: {}".format(label, self._neutrino_radio_button.get_label()))
 
     def show(self):
+        if not self._dialog:
+            self.init_dialog()
         self._dialog.run()
 
     def on_response(self, dialog, resp):
@@ -258,25 +284,10 @@ class SettingsDialog:
 
     def set_settings(self):
         self._s_type = self._settings.setting_type
-        self._host_field.set_text(self._settings.host)
-        self._port_field.set_text(self._settings.port)
-        self._login_field.set_text(self._settings.user)
-        self._password_field.set_text(self._settings.password)
-        self._http_login_field.set_text(self._settings.http_user)
-        self._http_password_field.set_text(self._settings.http_password)
-        self._http_port_field.set_text(self._settings.http_port)
+        for field, prop in self._profile_fields:
+            field.set_text(getattr(self._settings, prop))
         self._http_use_ssl_check_button.set_active(self._settings.http_use_ssl)
-        self._telnet_login_field.set_text(self._settings.telnet_user)
-        self._telnet_password_field.set_text(self._settings.telnet_password)
-        self._telnet_port_field.set_text(self._settings.telnet_port)
         self._telnet_timeout_spin_button.set_value(self._settings.telnet_timeout)
-        self._services_field.set_text(self._settings.services_path)
-        self._user_bouquet_field.set_text(self._settings.user_bouquet_path)
-        self._satellites_xml_field.set_text(self._settings.satellites_xml_path)
-        self._picons_field.set_text(self._settings.picons_path)
-        self._data_dir_field.set_text(self._settings.data_local_path)
-        self._picons_dir_field.set_text(self._settings.picons_local_path)
-        self._backup_dir_field.set_text(self._settings.backup_local_path)
         self._default_data_dir_field.set_text(self._settings.default_data_path)
         self._record_data_dir_field.set_text(self._settings.records_path)
         self._before_save_switch.set_active(self._settings.backup_before_save)
@@ -319,25 +330,10 @@ class SettingsDialog:
 
         self._s_type = SettingsType.ENIGMA_2 if self._enigma_radio_button.get_active() else SettingsType.NEUTRINO_MP
         self._settings.setting_type = self._s_type
-        self._settings.host = self._host_field.get_text()
-        self._settings.port = self._port_field.get_text()
-        self._settings.user = self._login_field.get_text()
-        self._settings.password = self._password_field.get_text()
-        self._settings.http_user = self._http_login_field.get_text()
-        self._settings.http_password = self._http_password_field.get_text()
-        self._settings.http_port = self._http_port_field.get_text()
+        for field, prop in self._profile_fields:
+            setattr(self._settings, prop, field.get_text())
         self._settings.http_use_ssl = self._http_use_ssl_check_button.get_active()
-        self._settings.telnet_user = self._telnet_login_field.get_text()
-        self._settings.telnet_password = self._telnet_password_field.get_text()
-        self._settings.telnet_port = self._telnet_port_field.get_text()
         self._settings.telnet_timeout = int(self._telnet_timeout_spin_button.get_value())
-        self._settings.services_path = self._services_field.get_text()
-        self._settings.user_bouquet_path = self._user_bouquet_field.get_text()
-        self._settings.satellites_xml_path = self._satellites_xml_field.get_text()
-        self._settings.picons_path = self._picons_field.get_text()
-        self._settings.data_local_path = self._data_dir_field.get_text()
-        self._settings.picons_local_path = self._picons_dir_field.get_text()
-        self._settings.backup_local_path = self._backup_dir_field.get_text()
 
     def apply_settings(self, item=None):
         if show_dialog(DialogType.QUESTION, self._dialog) != Gtk.ResponseType.OK: